@@ -1,5 +1,27 @@
 import bpy
+import gc
+import os
 import sys
+import numpy as np
+
+# Blender doesn't put the script's directory on sys.path; needed for meshopt_regions
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+try:
+    import meshoptimizer
+    from meshopt_regions import simplify_region
+except ImportError:
+    meshoptimizer = None  # Fall back to Blender's Decimate modifier
+
+try:
+    import cupy as cp
+except ImportError:
+    cp = None  # No GPU clustering path
+
+try:
+    from numba import njit, prange
+except ImportError:
+    njit = None  # Weights are computed with plain NumPy
 
 argv = sys.argv
 argv = argv[argv.index("--") + 1:]
@@ -14,75 +36,261 @@ print(f"Input: {input_file}")
 print(f"Output: {output_file}")
 print(f"Body ratio: {body_ratio}, Face ratio: {face_ratio}, Face cutoff Y: {face_cutoff_y}")
 
-# Clear scene
-bpy.ops.wm.read_factory_settings(use_empty=True)
+MIN_DECIMATE_FACES = 1000  # Meshes smaller than this are left as is
+SHARPNESS_LEVELS = 8  # Edge sharpness is quantized so the weight group needs few distinct weights
 
-# Import GLB
-bpy.ops.import_scene.gltf(filepath=input_file)
 
-mesh_objects = [obj for obj in bpy.context.scene.objects if obj.type == 'MESH']
-print(f"Found {len(mesh_objects)} mesh objects")
+def compute_weights_numpy(co, face_threshold, body_weight):
+    """Per-vertex Decimate weight from an (N, 3) coords array: 1.0 in the face region, body_weight elsewhere."""
+    return np.where(co[:, 1] >= face_threshold, 1.0, body_weight).astype(np.float32)
 
-for obj in mesh_objects:
-    print(f"Processing: {obj.name}")
-    bpy.context.view_layer.objects.active = obj
-    obj.select_set(True)
+
+def make_compute_weights_jit():
+    """JIT-compile the weight kernel; raises if Numba can't set it up (e.g. no cache location)."""
+    # Region predicates that need per-vertex loops (curvature, neighbours) stay fast when JIT-compiled;
+    # cache=True keeps the compiled kernel on disk so later Blender runs skip the compile
+    @njit(parallel=True, cache=True)
+    def compute_weights_jit(co, face_threshold, body_weight):
+        out = np.empty(co.shape[0], dtype=np.float32)
+        for i in prange(co.shape[0]):
+            out[i] = 1.0 if co[i, 1] >= face_threshold else body_weight
+        return out
+
+    return compute_weights_jit
+
+
+compute_weights = compute_weights_numpy
+if njit is not None:
+    try:
+        compute_weights = make_compute_weights_jit()
+    except Exception as e:
+        print(f"Numba JIT unavailable, using NumPy weights: {e}")
+
+
+def edge_sharpness(mesh, n):
+    """Per-vertex sharpness in [0, 1]: the largest dihedral bend (1 - cos) of any adjacent edge."""
+    tris = read_triangles(mesh)
+    normals = np.empty((len(tris), 3), dtype=np.float32)
+    mesh.loop_triangles.foreach_get("normal", normals.ravel())
     
-    # Get mesh data
-    mesh = obj.data
-    original_faces = len(mesh.polygons)
-    print(f"  Original faces: {original_faces}")
+    # Every triangle edge as a sorted vertex pair; an interior edge appears once per adjacent triangle
+    edges = np.sort(tris[:, [0, 1, 1, 2, 2, 0]].reshape(-1, 2), axis=1).astype(np.int64)
+    owner = np.repeat(np.arange(len(tris)), 3)
+    key = edges[:, 0] * n + edges[:, 1]
+    order = np.argsort(key, kind='stable')
+    key, edges, owner = key[order], edges[order], owner[order]
     
-    # Find Y bounds to determine face region
-    verts = mesh.vertices
-    min_y = min(v.co.y for v in verts)
-    max_y = max(v.co.y for v in verts)
-    y_range = max_y - min_y
-    face_threshold = max_y - (y_range * (1 - face_cutoff_y))  # Top portion is "face"
+    # Equal neighbouring keys are triangles sharing an edge
+    shared = np.flatnonzero(key[1:] == key[:-1])
+    cos_theta = (normals[owner[shared]] * normals[owner[shared + 1]]).sum(axis=1)
+    edge_score = np.clip(1.0 - cos_theta, 0.0, 1.0)
     
-    print(f"  Y range: {min_y:.2f} to {max_y:.2f}, face threshold: {face_threshold:.2f}")
+    score = np.zeros(n, dtype=np.float32)
+    np.maximum.at(score, edges[shared].ravel(), np.repeat(edge_score, 2))
+    return np.round(score * SHARPNESS_LEVELS) / SHARPNESS_LEVELS
+
+
+def weight_groups(weights):
+    """Return (weight, vertex indices) for each distinct weight, from a single sort."""
+    order = np.argsort(weights, kind='stable')
+    levels, starts = np.unique(weights[order], return_index=True)
+    return [(float(level), indices) for level, indices in zip(levels, np.split(order, starts[1:]))]
+
+
+def read_triangles(mesh):
+    """Return the mesh's loop triangles as an (N, 3) vertex index array."""
+    mesh.calc_loop_triangles()
+    tris = np.empty(len(mesh.loop_triangles) * 3, dtype=np.uint32)
+    mesh.loop_triangles.foreach_get("vertices", tris)
+    return tris.reshape(-1, 3)
+
+
+def rebuild_mesh(mesh, positions, tris):
+    """Replace mesh geometry with the given triangles, dropping vertices they no longer reference."""
+    used, remapped = np.unique(tris, return_inverse=True)
+    mesh.clear_geometry()
+    mesh.from_pydata(positions[used].tolist(), [], remapped.reshape(-1, 3).tolist())
+    mesh.update()
+
+
+def simplify_with_meshopt(mesh, co, mask):
+    """Rebuild mesh from meshoptimizer output, simplifying face and body triangles at their own ratios."""
+    tris = read_triangles(mesh)
     
-    # Create vertex groups for face and body
-    face_group = obj.vertex_groups.new(name="Face")
-    body_group = obj.vertex_groups.new(name="Body")
+    # A triangle touching the face region counts as face
+    face_tris = mask[tris].any(axis=1)
+    new_tris = np.concatenate([
+        simplify_region(tris[face_tris].ravel(), co, face_ratio),
+        simplify_region(tris[~face_tris].ravel(), co, body_ratio),
+    ])
+    rebuild_mesh(mesh, co, new_tris)
+
+
+def cluster_simplify(positions, tris, mask, batch):
+    """Vertex-cluster simplification on the GPU: snap vertices to a per-region grid and merge each cell.
     
-    face_verts = []
-    body_verts = []
+    Every step is an independent per-vertex or per-triangle array op, so it runs as CuPy kernels
+    instead of a serial edge-collapse queue. Several meshes can be concatenated into one call;
+    batch gives each vertex's mesh so cells and cell sizes stay per mesh.
+    """
+    pos = cp.asarray(positions)
+    tri = cp.asarray(tris, dtype=cp.int64)
+    region = cp.asarray(mask)
+    batch = cp.asarray(batch, dtype=cp.int64)
+    n = len(pos)
     
-    for v in verts:
-        if v.co.y >= face_threshold:
-            face_verts.append(v.index)
-        else:
-            body_verts.append(v.index)
+    # Pick a cell size per (mesh, region) so its surface area holds about ratio * its vertex count cells
+    v0, v1, v2 = pos[tri[:, 0]], pos[tri[:, 1]], pos[tri[:, 2]]
+    areas = 0.5 * cp.linalg.norm(cp.cross(v1 - v0, v2 - v0), axis=1)
+    vert_group = batch * 2 + region
+    tri_group = batch[tri[:, 0]] * 2 + region[tri].any(axis=1)
+    n_groups = int(batch.max()) * 2 + 2
+    group_ratio = cp.tile(cp.asarray([body_ratio, face_ratio], dtype=cp.float64), n_groups // 2)
+    target = cp.maximum(cp.bincount(vert_group, minlength=n_groups) * group_ratio, 1.0)
+    area = cp.bincount(tri_group, weights=areas, minlength=n_groups)
+    cell = cp.sqrt(cp.maximum(area / target, 1e-12)).astype(cp.float32)[vert_group]
     
-    face_group.add(face_verts, 1.0, 'REPLACE')
-    body_group.add(body_verts, 1.0, 'REPLACE')
+    # Integer grid cell per vertex; mesh and region are folded into the key so cells never mix
+    grid = cp.floor((pos - pos.min(axis=0)) / cell[:, None]).astype(cp.int64)
+    dims = grid.max(axis=0) + 1
+    key = (((batch * dims[0] + grid[:, 0]) * dims[1] + grid[:, 1]) * dims[2] + grid[:, 2]) * 2 + region
+    _, cluster = cp.unique(key, return_inverse=True)
+    cluster = cluster.ravel()
     
-    print(f"  Face vertices: {len(face_verts)}, Body vertices: {len(body_verts)}")
+    # Each cluster collapses to the mean of its vertices
+    counts = cp.bincount(cluster, minlength=n)[:, None]
+    merged = cp.stack([cp.bincount(cluster, weights=pos[:, k], minlength=n) for k in range(3)], axis=1)
+    merged = (merged / cp.maximum(counts, 1)).astype(cp.float32)
     
-    # First pass: Decimate body aggressively
-    bpy.ops.object.mode_set(mode='EDIT')
-    bpy.ops.mesh.select_all(action='DESELECT')
-    bpy.ops.object.mode_set(mode='OBJECT')
+    # Remap triangles; collapsed ones (edge or point) are dropped by the caller
+    return cp.asnumpy(merged), cp.asnumpy(cluster[tri])
+
+
+def simplify_with_clusters(items):
+    """Rebuild meshes from one batched GPU vertex-clustering call, with finer cells in face regions.
     
-    # Apply decimate with vertex group for body
-    mod_body = obj.modifiers.new(name="DecimateBody", type='DECIMATE')
-    mod_body.decimate_type = 'COLLAPSE'
-    mod_body.ratio = body_ratio
-    mod_body.vertex_group = "Body"
-    bpy.ops.object.modifier_apply(modifier="DecimateBody")
+    items is a list of (mesh, co, mask); all meshes are concatenated so the GPU work is one launch
+    sequence instead of one per mesh.
+    """
+    positions, tris, masks, batch, tri_counts = [], [], [], [], []
+    offset = 0
+    for i, (mesh, co, mask) in enumerate(items):
+        mesh_tris = read_triangles(mesh).astype(np.int64) + offset
+        positions.append(co)
+        tris.append(mesh_tris)
+        masks.append(mask)
+        batch.append(np.full(len(mask), i, dtype=np.int64))
+        tri_counts.append(len(mesh_tris))
+        offset += len(mask)
     
-    # Second pass: Decimate face less aggressively  
-    mod_face = obj.modifiers.new(name="DecimateFace", type='DECIMATE')
-    mod_face.decimate_type = 'COLLAPSE'
-    mod_face.ratio = face_ratio
-    mod_face.vertex_group = "Face"
-    bpy.ops.object.modifier_apply(modifier="DecimateFace")
+    merged, new_tris = cluster_simplify(
+        np.concatenate(positions), np.concatenate(tris), np.concatenate(masks), np.concatenate(batch)
+    )
     
-    new_faces = len(obj.data.polygons)
-    print(f"  New faces: {new_faces} ({100*new_faces/original_faces:.1f}%)")
+    # Split triangles back per mesh, dropping the ones collapsed into an edge or point
+    start = 0
+    for (mesh, _, _), count in zip(items, tri_counts):
+        mesh_tris = new_tris[start:start + count]
+        start += count
+        a, b, c = mesh_tris[:, 0], mesh_tris[:, 1], mesh_tris[:, 2]
+        rebuild_mesh(mesh, merged, mesh_tris[(a != b) & (b != c) & (a != c)])
+
+
+# Clear scene
+bpy.ops.wm.read_factory_settings(use_empty=True)
+
+# Import GLB
+bpy.ops.import_scene.gltf(filepath=input_file)
+
+mesh_objects = [obj for obj in bpy.context.scene.objects if obj.type == 'MESH']
+print(f"Found {len(mesh_objects)} mesh objects")
+
+# (obj, co, mask, original_faces) for meshes clustered together on the GPU after the loop
+gpu_batch = []
+
+for obj in mesh_objects:
+    print(f"Processing: {obj.name}")
     
-    obj.select_set(False)
+    try:
+        # Get mesh data
+        mesh = obj.data
+        original_faces = len(mesh.polygons)
+        print(f"  Original faces: {original_faces}")
+        if original_faces < MIN_DECIMATE_FACES:
+            print(f"  Skipping: fewer than {MIN_DECIMATE_FACES} faces")
+            continue
+        
+        # Find Y bounds to determine face region. Coords are bulk-read into one contiguous
+        # (N, 3) float32 buffer so column reductions run as vectorized NumPy loops
+        verts = mesh.vertices
+        n = len(verts)
+        co = np.empty((n, 3), dtype=np.float32)
+        verts.foreach_get("co", co.ravel())
+        ys = co[:, 1]
+        min_y = float(ys.min())
+        max_y = float(ys.max())
+        y_range = max_y - min_y
+        face_threshold = max_y - (y_range * (1 - face_cutoff_y))  # Top portion is "face"
+        
+        print(f"  Y range: {min_y:.2f} to {max_y:.2f}, face threshold: {face_threshold:.2f}")
+        
+        mask = ys >= face_threshold
+        face_count = int(np.count_nonzero(mask))
+        
+        print(f"  Face vertices: {face_count}, Body vertices: {n - face_count}")
+        
+        if meshoptimizer is not None:
+            simplify_with_meshopt(mesh, co, mask)
+        elif cp is not None:
+            gpu_batch.append((obj, co, mask, original_faces))
+            continue
+        else:
+            # Single "keep" weight group: face verts 1.0, body verts 0.0. COLLAPSE adds an edge cost of
+            # (2 - (w1 + w2)) * vertex_group_factor on the group weights, so high-weight edges collapse
+            # first; the group is inverted below so that 1.0 means keep and the body goes first
+            body_weight = 0.0
+            keep_group = obj.vertex_groups.new(name="KeepWeight")
+        
+            # vertex_groups.add takes one weight per call (and a plain list of ints), so add each
+            # distinct weight's verts at once
+            weights = compute_weights(co, face_threshold, body_weight)
+            # Pull weights toward 1.0 (keep, since the group is inverted) along sharp edges so
+            # creases (e.g. at the neck) are collapsed last
+            weights += (1.0 - weights) * edge_sharpness(mesh, n)
+            for weight, indices in weight_groups(weights):
+                keep_group.add(indices.tolist(), weight, 'REPLACE')
+        
+            # One decimate pass for both regions
+            mod = obj.modifiers.new(name="Decimate", type='DECIMATE')
+            mod.decimate_type = 'COLLAPSE'
+            # ratio is one whole-mesh target, so weight each region's ratio by its vertex share
+            mod.ratio = (face_count * face_ratio + (n - face_count) * body_ratio) / n
+            mod.vertex_group = "KeepWeight"
+            mod.invert_vertex_group = True
+            # Override context instead of changing the active/selected objects
+            with bpy.context.temp_override(object=obj, active_object=obj, selected_objects=[obj]):
+                bpy.ops.object.modifier_apply(modifier=mod.name)
+        
+        new_faces = len(obj.data.polygons)
+        print(f"  New faces: {new_faces} ({100*new_faces/original_faces:.1f}%)")
+    finally:
+        # Free per-object scratch data before moving on to keep peak memory down
+        keep_group = obj.vertex_groups.get("KeepWeight")
+        if keep_group is not None:
+            obj.vertex_groups.remove(keep_group)
+        for m in list(bpy.data.meshes):
+            if m.users == 0:
+                bpy.data.meshes.remove(m)
+        gc.collect()
+
+if gpu_batch:
+    print(f"Clustering {len(gpu_batch)} meshes in one GPU batch")
+    simplify_with_clusters([(obj.data, co, mask) for obj, co, mask, _ in gpu_batch])
+    for obj, _, _, original_faces in gpu_batch:
+        new_faces = len(obj.data.polygons)
+        print(f"  {obj.name}: New faces: {new_faces} ({100*new_faces/original_faces:.1f}%)")
+    gpu_batch.clear()
+    gc.collect()
 
 # Export
 bpy.ops.export_scene.gltf(filepath=output_file, export_format='GLB', use_selection=False)
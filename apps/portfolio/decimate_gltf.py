@@ -0,0 +1,272 @@
+#!/usr/bin/env python3
+"""
+Decimate a GLB without Blender, using pygltflib for I/O and meshoptimizer for simplification.
+
+Uses the same face/body split as decimate.py: triangles touching vertices above the face cutoff
+keep face_ratio of their triangles, everything else keeps body_ratio. decimate.py thresholds on
+Blender's Y after the glTF importer's Y-up to Z-up conversion, which is glTF -Z, so this script
+thresholds on -Z too and the same file gets the same "face" region from both. Vertex
+attributes (normals, UVs, skin joints/weights, morph targets) are remapped alongside the indices,
+so textures, skinning and animations come through untouched and nothing is decoded that the
+simplifier doesn't need.
+
+Usage:
+    python3 decimate_gltf.py input.glb output.glb [body_ratio] [face_ratio] [face_cutoff_y]
+
+Requirements:
+    pip3 install numpy pygltflib meshoptimizer
+"""
+
+import sys
+
+import numpy as np
+from pygltflib import GLTF2, Accessor, BufferView, ELEMENT_ARRAY_BUFFER, ARRAY_BUFFER
+
+from meshopt_regions import simplify_region
+
+COMPONENT_DTYPES = {
+    5120: np.int8,
+    5121: np.uint8,
+    5122: np.int16,
+    5123: np.uint16,
+    5125: np.uint32,
+    5126: np.float32,
+}
+TYPE_WIDTHS = {"SCALAR": 1, "VEC2": 2, "VEC3": 3, "VEC4": 4, "MAT2": 4, "MAT3": 9, "MAT4": 16}
+TRIANGLES = 4
+MIN_DECIMATE_FACES = 1000  # Primitives smaller than this are left as is
+
+# Extensions we can't handle: compressed geometry lives outside plain accessors, and the others
+# reference accessors from places accessor_refs() doesn't follow, so compact() would leave them dangling
+UNSUPPORTED_EXTENSIONS = {
+    "KHR_draco_mesh_compression",
+    "EXT_meshopt_compression",
+    "EXT_mesh_gpu_instancing",
+    "KHR_animation_pointer",
+}
+
+
+def attribute_items(attributes):
+    """(name, accessor index) pairs of a primitive's attributes or morph target."""
+    items = attributes.items() if isinstance(attributes, dict) else vars(attributes).items()
+    return [(name, index) for name, index in items if index is not None]
+
+
+def set_attribute(attributes, name, index):
+    if isinstance(attributes, dict):
+        attributes[name] = index
+    else:
+        setattr(attributes, name, index)
+
+
+def read_accessor(gltf, blob, index):
+    """Copy an accessor's data out of the binary blob as an (count, width) array."""
+    accessor = gltf.accessors[index]
+    if accessor.bufferView is None or accessor.sparse is not None:
+        raise ValueError(f"accessor {index} is sparse or has no buffer view")
+    view = gltf.bufferViews[accessor.bufferView]
+    dtype = np.dtype(COMPONENT_DTYPES[accessor.componentType])
+    width = TYPE_WIDTHS[accessor.type]
+    offset = (view.byteOffset or 0) + (accessor.byteOffset or 0)
+    stride = view.byteStride or dtype.itemsize * width
+    return np.ndarray(
+        (accessor.count, width), dtype=dtype, buffer=blob, offset=offset,
+        strides=(stride, dtype.itemsize),
+    ).copy()
+
+
+def append_accessor(gltf, extra, base_offset, data, like, target):
+    """Append data as a tightly packed accessor shaped like accessor `like`; returns its index."""
+    # Keep every view 4-byte aligned as the spec requires
+    extra.extend(b"\0" * (-len(extra) % 4))
+    gltf.bufferViews.append(BufferView(
+        buffer=0, byteOffset=base_offset + len(extra), byteLength=data.nbytes, target=target,
+    ))
+    extra.extend(data.tobytes())
+
+    accessor = Accessor(
+        bufferView=len(gltf.bufferViews) - 1,
+        componentType=like.componentType,
+        normalized=like.normalized,
+        count=len(data),
+        type=like.type,
+    )
+    # min/max are only required on POSITION; the caller fills them in there
+    gltf.accessors.append(accessor)
+    return len(gltf.accessors) - 1
+
+
+def face_axis(positions):
+    """Coordinate the face cutoff is applied to: glTF -Z, which is Y in Blender after import."""
+    return -positions[:, 2]
+
+
+def simplify_primitive(gltf, blob, extra, primitive, face_threshold, body_ratio, face_ratio):
+    """Simplify one triangle primitive, pointing it at newly appended accessors."""
+    positions = read_accessor(gltf, blob, primitive.attributes.POSITION).astype(np.float32)
+    if primitive.indices is not None:
+        tris = read_accessor(gltf, blob, primitive.indices).astype(np.uint32).reshape(-1, 3)
+    else:
+        tris = np.arange(len(positions), dtype=np.uint32).reshape(-1, 3)
+
+    # A triangle touching the face region counts as face
+    face_tris = (face_axis(positions) >= face_threshold)[tris].any(axis=1)
+    new_tris = np.concatenate([
+        simplify_region(tris[face_tris].ravel(), positions, face_ratio),
+        simplify_region(tris[~face_tris].ravel(), positions, body_ratio),
+    ])
+
+    # Drop vertices no longer referenced and remap every per-vertex attribute alongside
+    # (everything is read before anything is appended, so an unreadable attribute leaves the primitive as is)
+    used, remapped = np.unique(new_tris, return_inverse=True)
+    remapped_attributes = [
+        (attributes, name, index, read_accessor(gltf, blob, index)[used])
+        for attributes in [primitive.attributes] + list(primitive.targets or [])
+        for name, index in attribute_items(attributes)
+    ]
+    base_offset = len(blob)
+    for attributes, name, index, data in remapped_attributes:
+        new_index = append_accessor(gltf, extra, base_offset, data, gltf.accessors[index], ARRAY_BUFFER)
+        if name == "POSITION":
+            gltf.accessors[new_index].min = data.min(axis=0).tolist()
+            gltf.accessors[new_index].max = data.max(axis=0).tolist()
+        set_attribute(attributes, name, new_index)
+
+    index_dtype = np.uint16 if len(used) < 0xFFFF else np.uint32
+    index_like = Accessor(componentType=5123 if index_dtype is np.uint16 else 5125, type="SCALAR")
+    primitive.indices = append_accessor(
+        gltf, extra, base_offset, remapped.astype(index_dtype).reshape(-1, 1), index_like, ELEMENT_ARRAY_BUFFER,
+    )
+    return len(tris), len(remapped) // 3
+
+
+def accessor_refs(gltf):
+    """(owner, key) for every place the document references an accessor."""
+    refs = []
+    for mesh in gltf.meshes:
+        for primitive in mesh.primitives:
+            for attributes in [primitive.attributes] + list(primitive.targets or []):
+                refs.extend((attributes, name) for name, _ in attribute_items(attributes))
+            if primitive.indices is not None:
+                refs.append((primitive, "indices"))
+    for skin in gltf.skins:
+        if skin.inverseBindMatrices is not None:
+            refs.append((skin, "inverseBindMatrices"))
+    for animation in gltf.animations:
+        for sampler in animation.samplers:
+            refs.extend([(sampler, "input"), (sampler, "output")])
+    return refs
+
+
+def get_ref(owner, key):
+    return owner[key] if isinstance(owner, dict) else getattr(owner, key)
+
+
+def set_ref(owner, key, value):
+    if isinstance(owner, dict):
+        owner[key] = value
+    else:
+        setattr(owner, key, value)
+
+
+def compact(gltf, blob):
+    """Drop accessors and buffer views no longer referenced and repack the blob; returns the new blob."""
+    refs = accessor_refs(gltf)
+    kept_accessors = sorted({get_ref(owner, key) for owner, key in refs})
+    accessor_map = {old: new for new, old in enumerate(kept_accessors)}
+    for owner, key in refs:
+        set_ref(owner, key, accessor_map[get_ref(owner, key)])
+    gltf.accessors = [gltf.accessors[i] for i in kept_accessors]
+
+    # Buffer views are referenced by accessors (including sparse ones) and embedded images
+    view_owners = [(accessor, "bufferView") for accessor in gltf.accessors if accessor.bufferView is not None]
+    for accessor in gltf.accessors:
+        if accessor.sparse is not None:
+            view_owners += [(accessor.sparse.indices, "bufferView"), (accessor.sparse.values, "bufferView")]
+    view_owners += [(image, "bufferView") for image in gltf.images if image.bufferView is not None]
+
+    kept_views = sorted({get_ref(owner, key) for owner, key in view_owners})
+    view_map = {}
+    packed = bytearray()
+    for old in kept_views:
+        view = gltf.bufferViews[old]
+        packed.extend(b"\0" * (-len(packed) % 4))
+        start = view.byteOffset or 0
+        view.byteOffset = len(packed)
+        packed.extend(blob[start:start + view.byteLength])
+        view_map[old] = len(view_map)
+    for owner, key in view_owners:
+        set_ref(owner, key, view_map[get_ref(owner, key)])
+    gltf.bufferViews = [gltf.bufferViews[i] for i in kept_views]
+
+    gltf.buffers[0].byteLength = len(packed)
+    return bytes(packed)
+
+
+def main():
+    argv = sys.argv[1:]
+    if len(argv) < 2:
+        print(__doc__)
+        sys.exit(1)
+
+    input_file = argv[0]
+    output_file = argv[1]
+    body_ratio = float(argv[2]) if len(argv) > 2 else 0.02  # Very aggressive for body
+    face_ratio = float(argv[3]) if len(argv) > 3 else 0.15  # Keep more detail for face
+    face_cutoff_y = float(argv[4]) if len(argv) > 4 else 0.5  # Y threshold for "face" area
+
+    print(f"Input: {input_file}")
+    print(f"Output: {output_file}")
+    print(f"Body ratio: {body_ratio}, Face ratio: {face_ratio}, Face cutoff Y: {face_cutoff_y}")
+
+    gltf = GLTF2().load(input_file)
+    unsupported = UNSUPPORTED_EXTENSIONS.intersection(gltf.extensionsUsed or [])
+    if unsupported:
+        print(f"❌ Unsupported glTF extensions: {', '.join(sorted(unsupported))}")
+        sys.exit(1)
+    if len(gltf.buffers) != 1 or gltf.buffers[0].uri:
+        print("❌ Only self-contained GLB files (one embedded buffer) are supported")
+        sys.exit(1)
+
+    blob = gltf.binary_blob()
+    extra = bytearray()
+    print(f"Found {len(gltf.meshes)} meshes")
+
+    for mesh in gltf.meshes:
+        print(f"Processing: {mesh.name}")
+        triangle_prims = [
+            p for p in mesh.primitives
+            if (p.mode is None or p.mode == TRIANGLES) and p.attributes.POSITION is not None
+        ]
+        if not triangle_prims:
+            print("  No triangle primitives, skipping")
+            continue
+
+        # Y bounds per mesh come straight from the POSITION accessors' required min/max
+        # (-Z, see face_axis, so max Z gives min_y)
+        min_y = min(-gltf.accessors[p.attributes.POSITION].max[2] for p in triangle_prims)
+        max_y = max(-gltf.accessors[p.attributes.POSITION].min[2] for p in triangle_prims)
+        face_threshold = max_y - ((max_y - min_y) * (1 - face_cutoff_y))  # Top portion is "face"
+        print(f"  Y range: {min_y:.2f} to {max_y:.2f}, face threshold: {face_threshold:.2f}")
+
+        for primitive in triangle_prims:
+            index_source = primitive.indices if primitive.indices is not None else primitive.attributes.POSITION
+            if gltf.accessors[index_source].count // 3 < MIN_DECIMATE_FACES:
+                print(f"  Skipping primitive: fewer than {MIN_DECIMATE_FACES} faces")
+                continue
+            try:
+                original, new = simplify_primitive(
+                    gltf, blob, extra, primitive, face_threshold, body_ratio, face_ratio,
+                )
+            except ValueError as e:
+                print(f"  ⚠️  Skipping primitive: {e}")
+                continue
+            print(f"  Faces: {original} -> {new} ({100*new/max(original, 1):.1f}%)")
+
+    gltf.set_binary_blob(compact(gltf, blob + bytes(extra)))
+    gltf.save(output_file)
+    print(f"Exported to: {output_file}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,21 @@
+"""
+meshoptimizer helpers shared by decimate.py (inside Blender) and decimate_gltf.py.
+
+Kept free of bpy and pygltflib so either script can import it.
+"""
+
+import meshoptimizer
+import numpy as np
+
+
+def simplify_region(indices, positions, ratio):
+    """Simplify one region's triangles with meshoptimizer, locking its border so regions still stitch."""
+    target = int(len(indices) * ratio) // 3 * 3
+    dest = np.empty(len(indices), dtype=np.uint32)
+    count = meshoptimizer.simplify(
+        dest, indices, positions,
+        target_index_count=target,
+        target_error=0.01,
+        options=meshoptimizer.SIMPLIFY_LOCK_BORDER,
+    )
+    return dest[:count]
@@ -8,15 +8,19 @@ This script:
 3. Reports any errors found
 
 Usage:
-    python3 add_files_to_xcode.py
+    python3 add_files_to_xcode.py [--clean]
 
 Requirements:
     pip3 install pbxproj
 """
 
+import argparse
+import asyncio
 import sys
 import subprocess
 import os
+import re
+from collections import deque
 from pathlib import Path
 
 # Try to import pbxproj
@@ -46,6 +50,34 @@ NEW_FILES = [
 ]
 
 TARGET_NAME = "phoneless-hevy Watch App"
+BUILD_TIMEOUT = 300  # 5 minute timeout
+STDOUT_TAIL_LINES = 30  # Log lines shown on failure when no error/warning lines matched
+
+# Matches xcodebuild error/warning lines on the raw output bytes, without lowercasing each line
+DIAGNOSTIC_PATTERN = re.compile(rb'(?i)\b(?:error|warning):')
+
+# (scheme, destination) pairs checked by verify_build; they build concurrently
+BUILD_TARGETS = [
+    ("phoneless-hevy Watch App", "generic/platform=watchOS"),
+]
+
+
+def find_existing_files():
+    """Return the NEW_FILES entries that exist on disk, reading each directory once."""
+    by_parent = {}
+    for file_path in NEW_FILES:
+        by_parent.setdefault(Path(file_path).parent, []).append(file_path)
+
+    existing = set()
+    for parent, file_paths in by_parent.items():
+        try:
+            with os.scandir(WATCH_APP_DIR / parent) as it:
+                entries = {entry.name for entry in it if entry.is_file()}
+        except FileNotFoundError:
+            continue
+        existing.update(p for p in file_paths if Path(p).name in entries)
+
+    return existing
 
 
 def add_files_to_project():
@@ -63,26 +95,38 @@ def add_files_to_project():
         print(f"❌ Failed to load project: {e}")
         return False
 
-    # Add each file
+    # Index existing file names once instead of walking the project per file
+    existing_names = {
+        file_ref.get_name()
+        for file_ref in project.objects.get_objects_in_section('PBXFileReference')
+    }
+
+    # Collect files to add
+    to_add = []
     added_count = 0
     skipped_count = 0
 
+    files_on_disk = find_existing_files()
+
     for file_path in NEW_FILES:
         full_path = WATCH_APP_DIR / file_path
 
-        if not full_path.exists():
+        if file_path not in files_on_disk:
             print(f"⚠️  File not found: {file_path}")
             continue
 
-        # Check if file is already in project
-        existing = project.get_files_by_name(full_path.name)
-        if existing:
+        # Check if file is already in project (or already queued under the same name)
+        if full_path.name in existing_names:
             print(f"⏭️  Already in project: {file_path}")
             skipped_count += 1
             continue
 
+        existing_names.add(full_path.name)
+        to_add.append(file_path)
+
+    # Add the collected files (pbxproj has no bulk API, so one add_file per file)
+    for file_path in to_add:
         try:
-            # Add file to project
             # Path should be relative to project root
             rel_path = f"phoneless-hevy Watch App/{file_path}"
             project.add_file(rel_path, parent=None, target_name=TARGET_NAME)
@@ -91,7 +135,7 @@ def add_files_to_project():
         except Exception as e:
             print(f"❌ Failed to add {file_path}: {e}")
 
-    # Save project
+    # Save project once after all adds (save() writes the file in place, no backup copy)
     if added_count > 0:
         try:
             project.save()
@@ -105,51 +149,110 @@ def add_files_to_project():
     return True
 
 
-def verify_build():
-    """Run xcodebuild to check for compilation errors."""
-    print("\n🔨 Verifying build with xcodebuild...")
-    print("   (This may take a minute...)\n")
+async def run_build(scheme, destination, clean, semaphore):
+    """Build one scheme/destination.
 
-    try:
-        # Try to build the Watch App scheme
-        result = subprocess.run(
-            [
-                "xcodebuild",
-                "-project", str(PROJECT_PATH.parent),
-                "-scheme", "phoneless-hevy Watch App",
-                "-destination", "generic/platform=watchOS",
-                "clean", "build"
-            ],
+    Returns (returncode, diagnostics, stdout_tail, stderr); returncode is None on timeout.
+    """
+    # Incremental by default; a clean build recompiles everything and takes minutes
+    args = [
+        "xcodebuild",
+        "-project", str(PROJECT_PATH.parent),
+        "-scheme", scheme,
+        "-destination", destination,
+        "-quiet",
+        "-parallelizeTargets",
+        "-jobs", str(os.cpu_count() or 1),
+        "COMPILER_INDEX_STORE_ENABLE=NO",
+    ]
+    args += ["clean", "build"] if clean else ["build"]
+
+    async with semaphore:
+        proc = await asyncio.create_subprocess_exec(
+            *args,
             cwd=SCRIPT_DIR,
-            capture_output=True,
-            text=True,
-            timeout=300  # 5 minute timeout
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.PIPE,
+            limit=1024 * 1024  # xcodebuild can print very long lines
         )
+        diagnostics = []
+        stdout_tail = deque(maxlen=STDOUT_TAIL_LINES)
+        stderr = b""
 
-        if result.returncode == 0:
-            print("✅ Build succeeded!")
-            return True
-        else:
-            print("❌ Build failed with errors:\n")
-            # Print errors
-            if result.stderr:
-                print(result.stderr)
-            # Look for error lines in stdout
-            for line in result.stdout.split('\n'):
-                if 'error:' in line.lower() or 'warning:' in line.lower():
-                    print(line)
-            return False
+        async def read_stdout():
+            # Stream stdout line by line, keeping error/warning lines plus the last few for context
+            async for raw in proc.stdout:
+                stdout_tail.append(raw)
+                if DIAGNOSTIC_PATTERN.search(raw):
+                    diagnostics.append(raw.decode(errors="replace").rstrip('\n'))
 
-    except subprocess.TimeoutExpired:
-        print("⏱️  Build timed out after 5 minutes")
-        return False
+        async def collect():
+            # stderr is small (failure summaries, xcodebuild's own errors); read it whole alongside
+            _, err = await asyncio.gather(read_stdout(), proc.stderr.read())
+            return await proc.wait(), err
+
+        try:
+            returncode, stderr = await asyncio.wait_for(collect(), BUILD_TIMEOUT)
+        except asyncio.TimeoutError:
+            returncode = None
+        finally:
+            # Never leave xcodebuild running: on timeout, a read error (e.g. a line over the limit),
+            # or cancellation when another build in the gather fails
+            if proc.returncode is None:
+                proc.kill()
+                await proc.wait()
+
+    tail = [raw.decode(errors="replace").rstrip('\n') for raw in stdout_tail]
+    return returncode, diagnostics, tail, stderr.decode(errors="replace")
+
+
+async def run_builds(clean):
+    """Build all BUILD_TARGETS concurrently."""
+    # Each xcodebuild already runs many compile jobs, so only a few builds at once
+    semaphore = asyncio.Semaphore(max(1, (os.cpu_count() or 1) // 4))
+    return await asyncio.gather(*(
+        run_build(scheme, destination, clean, semaphore)
+        for scheme, destination in BUILD_TARGETS
+    ))
+
+
+def verify_build(clean=False):
+    """Run xcodebuild to check for compilation errors."""
+    print("\n🔨 Verifying build with xcodebuild...")
+    print("   (This may take a minute...)\n")
+
+    try:
+        results = asyncio.run(run_builds(clean))
     except Exception as e:
         print(f"❌ Build verification failed: {e}")
         return False
 
+    succeeded = True
+    for (scheme, destination), (returncode, diagnostics, stdout_tail, stderr) in zip(BUILD_TARGETS, results):
+        label = f"{scheme} ({destination})"
+        if returncode is None:
+            print(f"⏱️  Build timed out after {BUILD_TIMEOUT // 60} minutes: {label}")
+            succeeded = False
+        elif returncode == 0:
+            print(f"✅ Build succeeded: {label}")
+        else:
+            print(f"❌ Build failed with errors: {label}\n")
+            if stderr:
+                print(stderr)
+            # Without error/warning lines, show the end of the log instead of nothing
+            for line in diagnostics or stdout_tail:
+                print(line)
+            succeeded = False
+
+    return succeeded
+
 
 def main():
     """Main entry point."""
+    parser = argparse.ArgumentParser(description="Add new Swift files to the Xcode project and verify build.")
+    parser.add_argument("--clean", action="store_true", help="run a clean build instead of an incremental one")
+    args = parser.parse_args()
+
     print("🚀 Xcode Project File Manager\n")
     print(f"Project: {PROJECT_PATH.parent.name}")
     print(f"Target: {TARGET_NAME}\n")
@@ -161,7 +264,7 @@ def main():
 
     # Step 2: Verify build
     print("\n" + "="*60)
-    if not verify_build():
+    if not verify_build(clean=args.clean):
         print("\n⚠️  Build verification failed. Check errors above.")
         sys.exit(1)
 